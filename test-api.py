@@ -1,149 +1,251 @@
+import asyncio
+import random
+import re
 import socket
-import threading
 import time
 import json
+from collections import deque
 from datetime import datetime
 
+IRC_HOST = 'irc.chat.twitch.tv'
+IRC_PORT = 6667
+CONNECT_TIMEOUT = 10.0
+READ_LIMIT = 64 * 1024
+SOCKET_RCVBUF = 256 * 1024
+SAVE_INTERVAL = 30
+RECONNECT_BACKOFF_MIN = 1.0
+RECONNECT_BACKOFF_MAX = 60.0
+
+# :user!user@user.tmi.twitch.tv PRIVMSG #channel :message
+PRIVMSG_RE = re.compile(rb'^:([^!]+)![^ ]* PRIVMSG #\S+ :(.*)$')
+
+_ts_cache = [0, ""]
+
+def now_str():
+    """Current local time as text, formatted at most once per second"""
+    t = int(time.time())
+    if t != _ts_cache[0]:
+        _ts_cache[0] = t
+        _ts_cache[1] = datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M:%S')
+    return _ts_cache[1]
+
 class TwitchChatReader:
     def __init__(self, channel, nickname, token):
         self.channel = channel.lower()
         self.nickname = nickname.lower()
         self.token = token
-        self.socket = None
-        self.last_message = None
+        self.reader = None
+        self.writer = None
+        self.buffer = deque(maxlen=10000)
         self.running = False
-        self.last_save_time = time.time()
+        self._backoff = RECONNECT_BACKOFF_MIN
+        self.log_filename = "twitch_chat.txt"
+        self._log_file = None
         
-    def connect(self):
+    async def open_socket(self):
+        """Resolve the IRC host and return a tuned, connected socket"""
+        loop = asyncio.get_running_loop()
+        # Resolve first: the Windows Proactor loop's sock_connect needs a numeric address
+        infos = await loop.getaddrinfo(IRC_HOST, IRC_PORT, type=socket.SOCK_STREAM)
+        
+        error = None
+        for family, type_, proto, _, addr in infos:
+            sock = socket.socket(family, type_, proto)
+            try:
+                # Tune the socket before connecting so the receive window applies
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.setblocking(False)
+                await loop.sock_connect(sock, addr)
+                return sock
+            except OSError as e:
+                sock.close()
+                error = e
+            except BaseException:
+                sock.close()
+                raise
+                
+        raise error or OSError(f"Could not resolve {IRC_HOST}")
+        
+    async def connect(self):
         """Connect to Twitch IRC server"""
         try:
-            self.socket = socket.socket()
-            self.socket.settimeout(10.0)
-            self.socket.connect(('irc.chat.twitch.tv', 6667))
+            sock = await asyncio.wait_for(self.open_socket(), CONNECT_TIMEOUT)
+            self.reader, self.writer = await asyncio.open_connection(sock=sock, limit=READ_LIMIT)
             
             # Authenticate
-            self.socket.send(f"PASS {self.token}\r\n".encode('utf-8'))
-            self.socket.send(f"NICK {self.nickname}\r\n".encode('utf-8'))
-            self.socket.send(f"JOIN #{self.channel}\r\n".encode('utf-8'))
+            self.writer.write(
+                f"PASS {self.token}\r\n"
+                f"NICK {self.nickname}\r\n"
+                f"JOIN #{self.channel}\r\n".encode('utf-8')
+            )
+            await self.writer.drain()
             
             print(f"✅ Connected to #{self.channel}'s chat")
             return True
             
+        except asyncio.TimeoutError:
+            print(f"❌ Connection failed: timed out after {CONNECT_TIMEOUT:g}s")
+            self.close_connection()
+            return False
         except Exception as e:
-            print(f"❌ Connection failed: {e}")
+            print(f"❌ Connection failed: {type(e).__name__}: {e}")
+            self.close_connection()
             return False
-        
-    def listen(self):
+            
+    def close_connection(self):
+        """Close the current IRC connection, if any"""
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception as e:
+                print(f"Error closing connection: {e}")
+            self.reader = self.writer = None
+            
+    async def listen(self):
         """Listen for messages"""
-        buffer = ""
-        
+        skipping = False
         while self.running:
             try:
-                data = self.socket.recv(1024).decode('utf-8', errors='ignore')
-                if not data:
-                    print("⚠️  Connection lost, reconnecting...")
-                    self.reconnect()
-                    continue
+                line = await self.reader.readuntil(b"\r\n")
+                if skipping:
+                    # Tail of an overlong line, drop it
+                    skipping = False
+                elif len(line) > 2:
+                    self.handle_line(line[:-2])
                     
-                buffer += data
-                lines = buffer.split("\r\n")
-                buffer = lines.pop()
-                
-                for line in lines:
-                    if line:
-                        self.handle_line(line)
-                        
-            except socket.timeout:
-                continue
+            except asyncio.LimitOverrunError as e:
+                # Line longer than READ_LIMIT: drop it but keep the connection
+                if not skipping:
+                    print(f"⚠️  Skipping IRC line longer than {READ_LIMIT} bytes")
+                await self.reader.readexactly(e.consumed)
+                skipping = True
+            except asyncio.IncompleteReadError:
+                print("⚠️  Connection lost, reconnecting...")
+                skipping = False
+                if not await self.reconnect():
+                    break
             except Exception as e:
                 print(f"❌ Listen error: {e}")
-                if self.running:
-                    self.reconnect()
-                
+                skipping = False
+                if self.running and not await self.reconnect():
+                    break
+                    
     def handle_line(self, line):
-        """Handle incoming IRC messages"""
+        """Handle an incoming IRC line (raw bytes, without CRLF)"""
         # Respond to PING
-        if line.startswith('PING'):
-            self.socket.send("PONG :tmi.twitch.tv\r\n".encode('utf-8'))
+        if line.startswith(b'PING'):
+            self.writer.write(b"PONG :tmi.twitch.tv\r\n")
+            return
+            
+        # Welcome (001) means the login was accepted
+        if line.startswith(b':tmi.twitch.tv 001 '):
+            self._backoff = RECONNECT_BACKOFF_MIN
             return
             
         # Handle PRIVMSG (chat messages)
-        if 'PRIVMSG' in line:
+        match = PRIVMSG_RE.match(line)
+        if match:
             try:
-                # Parse the message
-                parts = line.split(':', 2)
-                if len(parts) >= 3:
-                    username = parts[1].split('!')[0]
-                    message = parts[2].strip()
-                    
-                    self.last_message = {
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'username': username,
-                        'message': message
-                    }
-                    
-                    print(f"💬 [{self.last_message['timestamp']}] {username}: {message}")
-                    
+                username = match.group(1).decode('utf-8', errors='ignore')
+                message = match.group(2).decode('utf-8', errors='ignore').strip()
+                
+                timestamp = now_str()
+                self.buffer.append(f"{timestamp} - {username}: {message}\n")
+                
+                print(f"💬 [{timestamp}] {username}: {message}")
+                
             except Exception as e:
                 print(f"Error parsing message: {e}")
                 
-    def reconnect(self):
-        """Reconnect to Twitch IRC"""
-        time.sleep(5)
+    async def reconnect(self):
+        """Reconnect to Twitch IRC, backing off exponentially between attempts"""
+        while self.running:
+            self.close_connection()
+            
+            # Jitter keeps many clients from reconnecting in lockstep
+            delay = self._backoff * random.uniform(0.8, 1.2)
+            print(f"🔄 Reconnecting in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+            
+            # Keep doubling until the server welcomes us (see handle_line),
+            # so a rejected login still backs off
+            self._backoff = min(RECONNECT_BACKOFF_MAX, self._backoff * 2)
+            if await self.connect():
+                return True
+            
+        return False
+        
+    def flush_buffer(self):
+        """Write all buffered messages to the log in one batch"""
+        count = len(self.buffer)
+        if count:
+            # Once the log accepts the batch it owns it: a failed flush() is
+            # retried from the file's own buffer on the next save
+            self._log_file.write("".join(self.buffer))
+            self.buffer.clear()
+        self._log_file.flush()
+        return count
+        
+    def save_messages(self):
+        """Save buffered messages"""
         try:
-            if self.socket:
-                self.socket.close()
-            self.connect()
+            count = self.flush_buffer()
+            if count:
+                print(f"💾 Saved {count} message(s) to {self.log_filename}")
+                
         except Exception as e:
-            print(f"Reconnection failed: {e}")
+            print(f"Error saving messages: {e}")
             
-    def save_last_message(self):
-        """Save the last message every 30 seconds"""
+    async def save_periodically(self):
+        """Save buffered messages every SAVE_INTERVAL seconds"""
         while self.running:
-            current_time = time.time()
-            if current_time - self.last_save_time >= 30 and self.last_message:
-                filename = "twitch_chat.txt"
-                
-                try:
-                    with open(filename, 'a', encoding='utf-8') as f:
-                        f.write(f"{self.last_message['timestamp']} - {self.last_message['username']}: {self.last_message['message']}\n")
-                    
-                    print(f"💾 Saved message to {filename}")
-                    self.last_save_time = current_time
-                    self.last_message = None  # Reset for next interval
-                    
-                except Exception as e:
-                    print(f"Error saving message: {e}")
-                    
-            time.sleep(1)
+            await asyncio.sleep(SAVE_INTERVAL)
+            self.save_messages()
             
-    def start(self):
-        """Start the chat reader"""
-        if not self.connect():
+    def open_log(self):
+        """Open the chat log once and keep it open while running"""
+        if self._log_file is None:
+            self._log_file = open(self.log_filename, 'a', encoding='utf-8', buffering=64 * 1024)
+            
+    def close_log(self):
+        """Flush and close the chat log"""
+        if self._log_file is not None:
+            try:
+                self.flush_buffer()
+                self._log_file.close()
+            except Exception as e:
+                print(f"Error closing log file: {e}")
+            self._log_file = None
+            
+    async def run(self):
+        """Connect, then read and save chat until stopped"""
+        if not await self.connect():
             return
             
+        self.open_log()
         self.running = True
-        
-        # Start listening thread
-        listen_thread = threading.Thread(target=self.listen)
-        listen_thread.daemon = True
-        listen_thread.start()
-        
-        # Start saving thread
-        save_thread = threading.Thread(target=self.save_last_message)
-        save_thread.daemon = True
-        save_thread.start()
+        save_task = asyncio.create_task(self.save_periodically())
         
         print("🚀 Chat reader started! Press Ctrl+C to stop.")
         
         try:
-            while self.running:
-                time.sleep(1)
+            await self.listen()
+        finally:
+            self.running = False
+            save_task.cancel()
+            self.close_connection()
+            self.close_log()
+            
+    def start(self):
+        """Start the chat reader"""
+        try:
+            asyncio.run(self.run())
         except KeyboardInterrupt:
             print("\n🛑 Stopping...")
+        finally:
             self.running = False
-            if self.socket:
-                self.socket.close()
+            self.close_log()
 
 def load_credentials():
     """Load Twitch credentials from credentials.json file"""